@@ -1,25 +1,65 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import google.generativeai as genai
-import requests
+import orjson
 import os
-import json
+import sys
 import logging
-import traceback
+import threading
+import time
+from collections import Counter
+from cachetools import TTLCache, cached
+from cachetools.keys import hashkey
 from dotenv import load_dotenv
-from recipe_sources import RecipeSource
+from json_utils import collect_streamed_json, extract_json_object
+from recipe_sources import RecipeSource, create_session
+from semantic_cache import SemanticCache
+
+# Load environment variables before reading LOG_LEVEL
+load_dotenv()
 
 # Configure logging
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Tracebacks are logged at most this many times per exception type per minute,
+# so an error storm (e.g. exhausted Gemini quota) doesn't flood the logs
+ERROR_LOG_LIMIT_PER_MINUTE = 100
+_error_counts = Counter()
+_error_window_start = time.monotonic()
+_error_lock = threading.Lock()
+
+def _log_exception(message):
+    """Log the exception being handled, rate limited per exception type"""
+    global _error_window_start
+    exc_type = sys.exc_info()[0]
+    with _error_lock:
+        now = time.monotonic()
+        if now - _error_window_start >= 60:
+            _error_counts.clear()
+            _error_window_start = now
+        _error_counts[exc_type] += 1
+        count = _error_counts[exc_type]
+    if count <= ERROR_LOG_LIMIT_PER_MINUTE:
+        logger.exception(message)
+    elif count == ERROR_LOG_LIMIT_PER_MINUTE + 1:
+        logger.error("%s: suppressing further %s tracebacks for this minute", message, exc_type.__name__)
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 CORS(app)
 
 # Configure Google API
@@ -28,12 +68,229 @@ if not GOOGLE_API_KEY:
     logger.error("GOOGLE_API_KEY not found in environment variables")
     raise ValueError("GOOGLE_API_KEY environment variable is required")
 
+# Context fields extracted from the user's request, with the question asked
+# when each one is still missing
+CONTEXT_FIELDS = ('diet_type', 'cuisine', 'dish_attributes')
+CLARIFYING_QUESTIONS = (
+    "What kind of diet are you following (vegetarian, vegan, or non-vegetarian)?",
+    "What type of cuisine are you interested in?",
+    "Do you have any specific preferences for the dish (e.g., spicy, creamy, quick to make)?",
+)
+NO_PREFERENCE_PHRASES = frozenset({'no preference', 'any', 'anything', 'whatever', "doesn't matter"})
+
+# Clarifying rounds before missing fields are defaulted to 'any'
+MAX_CLARIFICATIONS = 3
+
+# Static instructions for the context extraction prompts. These are sent as
+# system instructions so they stay byte-identical across requests.
+CONTEXT_JSON_FORMAT = """{
+    "diet_type": "vegetarian", "vegan", "non-veg", or null,
+    "cuisine": specific cuisine or null,
+    "dish_attributes": specific attributes or null,
+    "clarifying_questions": [
+        "question for missing field 1",
+        "question for missing field 2"
+    ]
+}"""
+
+INITIAL_CONTEXT_INSTRUCTIONS = f"""
+Extract the following information from the user's recipe request:
+- diet_type (vegetarian, vegan, or non-veg)
+- cuisine (e.g., Indian, Chinese, Italian, etc.)
+- dish_attributes (specific characteristics or preferences)
+
+Return the information in this JSON format:
+{CONTEXT_JSON_FORMAT}
+
+Rules:
+1. Only ask clarifying questions if absolutely necessary
+2. If you understand any preference, use it
+3. If a field is unclear, set it to null and add a clarifying question
+4. If the user says "any", "no preference", or similar, set that field to "any"
+"""
+
+FOLLOWUP_CONTEXT_INSTRUCTIONS = f"""
+You are given the previous context of a recipe search and the user's response to clarifying questions.
+
+Extract the following information and return it in JSON format:
+{CONTEXT_JSON_FORMAT}
+
+Rules:
+1. Keep all previously provided values unless explicitly changed
+2. Only ask clarifying questions for fields that are still unclear
+3. If the user provides new information, update only those specific fields
+4. If a field is still unclear, set it to null and add a clarifying question
+5. If the user says "any", "no preference", or similar, set that field to "any"
+"""
+
+# Per-request prompt tails, split at their interpolation points at import time
+INITIAL_PROMPT_PREFIX = 'Recipe request: "'
+INITIAL_PROMPT_SUFFIX = '"\n'
+FOLLOWUP_PROMPT_PARTS = (
+    'Previous context:\n- Diet type: ',
+    '\n- Cuisine: ',
+    '\n- Dish attributes: ',
+    '\n\nUser\'s response to clarifying questions: "',
+    '"\n',
+)
+
+def _followup_prompt(text, previous_context):
+    """Build the follow-up prompt tail from the previous context and the user's answer"""
+    values = [str(previous_context.get(key)) for key in CONTEXT_FIELDS]
+    values.append(text)
+    parts = [FOLLOWUP_PROMPT_PARTS[0]]
+    for value, part in zip(values, FOLLOWUP_PROMPT_PARTS[1:]):
+        parts.append(value)
+        parts.append(part)
+    return ''.join(parts)
+
 # Configure Gemini
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')
+GEMINI_MODEL = 'gemini-1.5-flash'
+# Use the REST transport so Gemini calls are plain socket I/O that gevent
+# workers can overlap, rather than gRPC calls that block the worker
+genai.configure(api_key=GOOGLE_API_KEY, transport='rest')
+initial_model = genai.GenerativeModel(GEMINI_MODEL, system_instruction=INITIAL_CONTEXT_INSTRUCTIONS)
+followup_model = genai.GenerativeModel(GEMINI_MODEL, system_instruction=FOLLOWUP_CONTEXT_INSTRUCTIONS)
+
+# Shared HTTP session so outbound requests reuse pooled keep-alive connections
+SESSION = create_session()
 
 # Initialize recipe sources
-recipe_source = RecipeSource()
+recipe_source = RecipeSource(session=SESSION)
+
+# Cache parsed Gemini context responses for repeated requests. Exact matches
+# only: short answers like 'vegan' and 'vegetarian' embed too close together
+# for a similarity match to be safe
+context_cache = SemanticCache(embed_fn=None)
+
+def _json_response(body, status=200):
+    """Wrap already-serialized JSON bytes in a response, bypassing jsonify"""
+    return Response(body, status=status, mimetype='application/json')
+
+def _freeze(value):
+    """Hashable equivalent of a JSON value"""
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+def _context_key(previous_context):
+    """Hashable view of the fields of previous_context used in the prompt"""
+    if not previous_context:
+        return None
+    return tuple((key, _freeze(previous_context.get(key))) for key in CONTEXT_FIELDS)
+
+def _generate_context(gemini_model, prompt):
+    """Send the prompt to Gemini and parse the JSON context it returns"""
+    # Stream the response so we can stop reading as soon as the JSON object closes
+    response = gemini_model.generate_content(prompt, stream=True)
+    response_text = collect_streamed_json(chunk.text for chunk in response if chunk.parts)
+    logger.debug("Received response from Gemini: %s", response_text)
+
+    # Parse the response text as JSON
+    try:
+        # First try to parse the response directly
+        context = orjson.loads(response_text)
+        logger.info("Successfully parsed Gemini response as JSON")
+    except orjson.JSONDecodeError as e:
+        logger.warning("Failed to parse response directly: %s", e)
+        # If that fails, try to extract JSON from the text
+        json_text = extract_json_object(response_text)
+        if json_text is None:
+            logger.error("Could not find JSON in response")
+            raise Exception("Could not parse Gemini response as JSON")
+        try:
+            context = orjson.loads(json_text)
+            logger.info("Successfully extracted and parsed JSON from response")
+        except orjson.JSONDecodeError as e:
+            logger.error("Extracted text is not valid JSON: %s", e)
+            raise Exception("Could not parse Gemini response as JSON")
+    return context
+
+def _default_context(previous_context):
+    """Serialized context that keeps previous values and defaults missing fields to 'any'"""
+    context = dict(previous_context or {})
+    for key in CONTEXT_FIELDS:
+        if not context.get(key) or context[key] == 'null':
+            context[key] = 'any'
+    context['clarifying_questions'] = []
+    return orjson.dumps(context)
+
+def _compute_context_key(text, previous_context, max_clarifications_reached):
+    return hashkey(text, _context_key(previous_context), max_clarifications_reached)
+
+# Serialized responses for repeated requests, expiring with the Gemini response cache
+@cached(
+    TTLCache(maxsize=1024, ttl=context_cache.ttl),
+    key=_compute_context_key,
+    lock=threading.Lock(),
+    info=True,
+)
+def _compute_context(text, previous_context, max_clarifications_reached):
+    """
+    Extract the recipe context for a request and return it serialized as JSON.
+    previous_context is used as sent; only its frozen fields form the cache key.
+    """
+    prev_ctx_key = _context_key(previous_context)
+
+    # Answer locally, without Gemini, when there is nothing left to extract
+    if max_clarifications_reached:
+        logger.info("Maximum clarifications reached, using defaults for missing fields")
+        return _default_context(previous_context)
+    if not text or text in NO_PREFERENCE_PHRASES:
+        logger.info("No preference given, using defaults for missing fields")
+        return _default_context(previous_context)
+
+    # Only the request-specific tail is sent; the instructions live in the
+    # model's system instruction so the prompt prefix is identical every call
+    if previous_context:
+        gemini_model = followup_model
+        prompt = _followup_prompt(text, previous_context)
+    else:
+        gemini_model = initial_model
+        prompt = ''.join((INITIAL_PROMPT_PREFIX, text, INITIAL_PROMPT_SUFFIX))
+
+    # Get response from Gemini, reusing the answer to an identical earlier request
+    context = context_cache.get_or_compute(
+        text,
+        lambda: _generate_context(gemini_model, prompt),
+        scope=prev_ctx_key,
+    )
+
+    # Canonicalize every field in one pass: 'null' strings become missing,
+    # no-preference answers become 'any', missing values fall back to the
+    # previous context, and anything still missing defaults to 'any'
+    missing_questions = []
+    for key, question in zip(CONTEXT_FIELDS, CLARIFYING_QUESTIONS):
+        value = context.get(key)
+        if isinstance(value, str):
+            # Normalize Gemini's value once for both checks
+            normalized = value.strip().lower()
+            if normalized == 'null':
+                value = None
+            elif normalized in NO_PREFERENCE_PHRASES:
+                value = 'any'
+                logger.debug("Setting %s to 'any' based on user response", key)
+        if value is None and previous_context and previous_context.get(key) is not None:
+            value = previous_context[key]
+            logger.debug("Keeping previous value for %s: %s", key, value)
+        if not value:  # This catches None and empty string
+            missing_questions.append(question)
+            value = 'any'
+        context[key] = value
+
+    if previous_context:
+        # Only ask clarifying questions for fields that are still missing
+        context['clarifying_questions'] = missing_questions
+        if not missing_questions:
+            logger.info("All fields filled, no more clarifying questions needed")
+    elif not context.get('clarifying_questions'):
+        # For initial request, prefer the clarifying questions from Gemini
+        context['clarifying_questions'] = missing_questions
+
+    logger.info("Final context object: %s", context)
+    return orjson.dumps(context)
 
 @app.route('/extract_context', methods=['POST'])
 def extract_context():
@@ -41,167 +298,30 @@ def extract_context():
         data = request.get_json()
         if not data or 'text' not in data:
             logger.error("No text provided in request")
-            return jsonify({'error': 'No text provided'}), 400
+            return _json_response(orjson.dumps({'error': 'No text provided'}), status=400)
 
-        text = data.get('text', '').lower()  # Convert to lowercase for easier matching
+        # Normalize once and intern, so the cache lookups below hash and
+        # compare the same string object
+        text = sys.intern(data.get('text', '').lower().strip())
         previous_context = data.get('previous_context')
         clarification_count = data.get('clarification_count', 0)
-        MAX_CLARIFICATIONS = 3
 
-        logger.info(f"Received text for context extraction: {text}")
-        if previous_context:
-            logger.info(f"Previous context: {previous_context}")
-        logger.info(f"Clarification count: {clarification_count}")
-
-        # If we've reached max clarifications, use defaults for missing fields
-        if clarification_count >= MAX_CLARIFICATIONS:
-            logger.info("Maximum clarifications reached, using defaults for missing fields")
-            context = previous_context or {}
-            for key in ['diet_type', 'cuisine', 'dish_attributes']:
-                if not context.get(key) or context[key] == 'null':
-                    context[key] = 'any'
-            context['clarifying_questions'] = []
-            return jsonify(context)
-
-        # Create a prompt for Gemini based on whether this is a follow-up
+        logger.info("Received text for context extraction: %s", text)
         if previous_context:
-            prompt = f"""
-            Previous context:
-            - Diet type: {previous_context.get('diet_type')}
-            - Cuisine: {previous_context.get('cuisine')}
-            - Dish attributes: {previous_context.get('dish_attributes')}
-
-            User's response to clarifying questions: "{text}"
-
-            Extract the following information and return it in JSON format:
-            {{
-                "diet_type": "vegetarian", "vegan", "non-veg", or null,
-                "cuisine": specific cuisine or null,
-                "dish_attributes": specific attributes or null,
-                "clarifying_questions": [
-                    "question for missing field 1",
-                    "question for missing field 2"
-                ]
-            }}
-
-            Rules:
-            1. Keep all previously provided values unless explicitly changed
-            2. Only ask clarifying questions for fields that are still unclear
-            3. If the user provides new information, update only those specific fields
-            4. If a field is still unclear, set it to null and add a clarifying question
-            5. If the user says "any", "no preference", or similar, set that field to "any"
-            """
-        else:
-            prompt = f"""
-            Extract the following information from this recipe request: "{text}"
-            - diet_type (vegetarian, vegan, or non-veg)
-            - cuisine (e.g., Indian, Chinese, Italian, etc.)
-            - dish_attributes (specific characteristics or preferences)
-
-            Return the information in this JSON format:
-            {{
-                "diet_type": "vegetarian", "vegan", "non-veg", or null,
-                "cuisine": specific cuisine or null,
-                "dish_attributes": specific attributes or null,
-                "clarifying_questions": [
-                    "question for missing field 1",
-                    "question for missing field 2"
-                ]
-            }}
-
-            Rules:
-            1. Only ask clarifying questions if absolutely necessary
-            2. If you understand any preference, use it
-            3. If a field is unclear, set it to null and add a clarifying question
-            4. If the user says "any", "no preference", or similar, set that field to "any"
-            """
-
-        # Get response from Gemini
-        response = model.generate_content(prompt)
-        response_text = response.text
-        logger.info(f"Received response from Gemini: {response_text}")
-        
-        # Parse the response text as JSON
-        try:
-            # First try to parse the response directly
-            context = json.loads(response_text)
-            logger.info("Successfully parsed Gemini response as JSON")
-        except json.JSONDecodeError as e:
-            logger.warning(f"Failed to parse response directly: {e}")
-            # If that fails, try to extract JSON from the text
-            import re
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                context = json.loads(json_match.group())
-                logger.info("Successfully extracted and parsed JSON from response")
-            else:
-                logger.error("Could not find JSON in response")
-                raise Exception("Could not parse Gemini response as JSON")
-
-        # Convert string 'null' to actual null
-        for key in ['diet_type', 'cuisine', 'dish_attributes']:
-            if context.get(key) == 'null':
-                context[key] = None
-
-        # Handle "no preference" responses
-        no_preference_phrases = ['no preference', 'any', 'anything', 'whatever', 'doesn\'t matter']
-        for key in ['diet_type', 'cuisine', 'dish_attributes']:
-            if context.get(key) and context[key].lower() in no_preference_phrases:
-                context[key] = 'any'
-                logger.info(f"Setting {key} to 'any' based on user response")
-
-        # Modified context merging logic
-        if previous_context:
-            logger.info(f"Merging with previous context: {previous_context}")
-            # Keep non-null values from previous context
-            for key in ['diet_type', 'cuisine', 'dish_attributes']:
-                if context.get(key) is None and previous_context.get(key) is not None:
-                    context[key] = previous_context[key]
-                    logger.info(f"Keeping previous value for {key}: {previous_context[key]}")
-                elif context.get(key) is not None:
-                    logger.info(f"Using new value for {key}: {context[key]}")
-
-            # Only ask clarifying questions for fields that are still null
-            clarifying_questions = []
-            if not context.get('diet_type'):
-                clarifying_questions.append("What kind of diet are you following (vegetarian, vegan, or non-vegetarian)?")
-            if not context.get('cuisine'):
-                clarifying_questions.append("What type of cuisine are you interested in?")
-            if not context.get('dish_attributes'):
-                clarifying_questions.append("Do you have any specific preferences for the dish (e.g., spicy, creamy, quick to make)?")
-            
-            # Only update clarifying questions if we still have missing fields
-            if clarifying_questions:
-                context['clarifying_questions'] = clarifying_questions
-            else:
-                context['clarifying_questions'] = []
-                logger.info("All fields filled, no more clarifying questions needed")
-        else:
-            # For initial request, use the clarifying questions from Gemini
-            if not context.get('clarifying_questions'):
-                context['clarifying_questions'] = []
-                for key in ['diet_type', 'cuisine', 'dish_attributes']:
-                    if not context.get(key):
-                        if key == 'diet_type':
-                            context['clarifying_questions'].append("What kind of diet are you following (vegetarian, vegan, or non-vegetarian)?")
-                        elif key == 'cuisine':
-                            context['clarifying_questions'].append("What type of cuisine are you interested in?")
-                        elif key == 'dish_attributes':
-                            context['clarifying_questions'].append("Do you have any specific preferences for the dish (e.g., spicy, creamy, quick to make)?")
-
-        # Ensure all required fields exist
-        for key in ['diet_type', 'cuisine', 'dish_attributes']:
-            if not context.get(key):  # This catches None and empty string
-                context[key] = 'any'
-        context.setdefault('clarifying_questions', [])
-        
-        logger.info(f"Final context object: {context}")
-        return jsonify(context)
+            logger.info("Previous context: %s", previous_context)
+        logger.info("Clarification count: %s", clarification_count)
+
+        body = _compute_context(
+            text,
+            previous_context,
+            clarification_count >= MAX_CLARIFICATIONS,
+        )
+        logger.debug("Context cache: %s", _compute_context.cache_info())
+        return _json_response(body)
 
     except Exception as e:
-        error_msg = f"Error in extract_context: {str(e)}\n{traceback.format_exc()}"
-        logger.error(error_msg)
-        return jsonify({'error': str(e)}), 500
+        _log_exception("Error in extract_context")
+        return _json_response(orjson.dumps({'error': str(e)}), status=500)
 
 @app.route('/get_recipes', methods=['POST'])
 def get_recipes():
@@ -209,20 +329,20 @@ def get_recipes():
         data = request.get_json()
         if not data:
             logger.error("No data provided in request")
-            return jsonify({'error': 'No data provided'}), 400
+            return _json_response(orjson.dumps({'error': 'No data provided'}), status=400)
 
-        logger.info(f"Received recipe request with data: {data}")
+        logger.info("Received recipe request with data: %s", data)
         
         # Get recipes from all available sources
         recipes = recipe_source.get_all_recipes(data)
-        logger.info(f"Retrieved {len(recipes)} recipes from all sources")
+        logger.info("Retrieved %s recipes from all sources", len(recipes))
         
-        return jsonify(recipes)
+        return _json_response(orjson.dumps(recipes))
 
     except Exception as e:
-        error_msg = f"Error in get_recipes: {str(e)}\n{traceback.format_exc()}"
-        logger.error(error_msg)
-        return jsonify({'error': str(e)}), 500
+        _log_exception("Error in get_recipes")
+        return _json_response(orjson.dumps({'error': str(e)}), status=500)
 
 if __name__ == '__main__':
-    app.run(debug=True) 
\ No newline at end of file
+    # Development server only; production runs under gunicorn (see gunicorn_conf.py)
+    app.run(debug=bool(os.getenv('FLASK_DEV')))
@@ -0,0 +1,28 @@
+"""
+Production server configuration.
+
+Run from the backend directory with:
+    gunicorn -c gunicorn_conf.py app:app
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Requests spend nearly all their time waiting on Gemini and recipe APIs, so
+# cooperative gevent workers let each process overlap many in-flight calls.
+# Gemini is configured with the REST transport, so its calls yield to gevent too.
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gevent'
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# HTTP/1.1 keep-alive so the frontend can reuse its connection
+keepalive = 30
+
+# Gemini calls can run for several seconds
+timeout = 60
+
+# Keep per-request INFO logging out of production unless asked for
+loglevel = 'warning'
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
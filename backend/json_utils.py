@@ -0,0 +1,72 @@
+import re
+from typing import Iterable, Optional
+
+# Characters that can change brace depth or string state; everything between
+# them is skipped by the regex engine in C
+_JSON_TOKEN_RE = re.compile(r'[{}"\\]')
+
+
+class _BraceScanner:
+    """Tracks the brace depth of the first top-level JSON object, ignoring braces inside strings"""
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.start = -1
+        self.offset = 0
+        self._skip_at = -1
+
+    def feed(self, text: str) -> int:
+        """
+        Feed the next piece of text. Returns the offset just past the closing
+        brace of the first object once it is complete, otherwise -1.
+        """
+        base = self.offset
+        self.offset += len(text)
+        for match in _JSON_TOKEN_RE.finditer(text):
+            pos = base + match.start()
+            if pos == self._skip_at:
+                continue
+            char = match.group()
+            if self.in_string:
+                if char == '\\':
+                    self._skip_at = pos + 1
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                if self.depth:
+                    self.in_string = True
+            elif char == '{':
+                if not self.depth:
+                    self.start = pos
+                self.depth += 1
+            elif char == '}' and self.depth:
+                self.depth -= 1
+                if not self.depth:
+                    return pos + 1
+        return -1
+
+
+def collect_streamed_json(chunks: Iterable[str]) -> str:
+    """
+    Accumulate streamed text until the first JSON object is complete, without
+    waiting for any trailing output. Returns everything received if the
+    object never closes.
+    """
+    scanner = _BraceScanner()
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        end = scanner.feed(chunk)
+        if end >= 0:
+            return ''.join(parts)[:end]
+    return ''.join(parts)
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    """Return the first balanced top-level JSON object in text, or None if there is none"""
+    scanner = _BraceScanner()
+    end = scanner.feed(text)
+    if end < 0:
+        return None
+    return text[scanner.start:end]
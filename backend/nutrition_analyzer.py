@@ -1,134 +1,158 @@
 import json
 import logging
+import fastjsonschema
 import google.generativeai as genai
+import orjson
+from json_utils import collect_streamed_json, extract_json_object
 from typing import Dict, Any, Optional
-import traceback
-import re
+from semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 
+NUTRIENT_KEYS = ('calories', 'protein', 'carbs', 'fat')
+
+# Shape of a nutrition analysis, compiled once into a Python validator
+NUTRITION_SCHEMA = {
+    'type': 'object',
+    'required': ['nutrition', 'confidence', 'serving_size', 'notes'],
+    'properties': {
+        'nutrition': {
+            'type': 'object',
+            'properties': {key: {'type': ['number', 'null']} for key in NUTRIENT_KEYS},
+        },
+        'confidence': {
+            'type': 'object',
+            'properties': {key: {'type': ['number', 'null'], 'minimum': 0, 'maximum': 1} for key in NUTRIENT_KEYS},
+        },
+        'serving_size': {'type': 'object'},
+        'notes': {'type': 'array'},
+    },
+}
+validate_nutrition_data = fastjsonschema.compile(NUTRITION_SCHEMA)
+
+def _coerce_numeric_strings(nutrition_data: Dict[str, Any]) -> None:
+    """Turn numeric strings such as "120" into floats, as float() accepted them, so the schema sees numbers"""
+    for section in ('nutrition', 'confidence'):
+        block = nutrition_data.get(section)
+        if not isinstance(block, dict):
+            continue
+        for key in NUTRIENT_KEYS:
+            value = block.get(key)
+            if isinstance(value, str):
+                try:
+                    block[key] = float(value)
+                except ValueError:
+                    pass  # left as a string for the schema to reject
+
+# Static part of the nutrition prompt, sent as the system instruction so it is
+# byte-identical across requests and only the recipe varies
+NUTRITION_INSTRUCTIONS = """
+Analyze the given recipe and provide nutritional information in a structured format.
+
+Return ONLY a JSON object in this exact format:
+{
+    "nutrition": {
+        "calories": number,
+        "protein": number,
+        "carbs": number,
+        "fat": number
+    },
+    "confidence": {
+        "calories": number between 0-1,
+        "protein": number between 0-1,
+        "carbs": number between 0-1,
+        "fat": number between 0-1
+    },
+    "serving_size": {
+        "amount": number,
+        "unit": "g" or "ml" or "oz" or "cup"
+    },
+    "notes": [
+        "List of assumptions made",
+        "Key ingredients considered",
+        "Any limitations in the analysis"
+    ]
+}
+
+Rules:
+1. All numbers must be integers or floats
+2. Confidence scores must be between 0 and 1
+3. Only include the JSON object, no other text
+4. If you can't determine a value, use null
+5. Base estimates on standard portion sizes
+6. Consider cooking methods and their impact on nutrition
+"""
+
 class NutritionAnalyzer:
-    def __init__(self, model):
-        self.model = model
+    def __init__(self, model, cache: Optional[SemanticCache] = None):
+        self.model = genai.GenerativeModel(model.model_name, system_instruction=NUTRITION_INSTRUCTIONS)
+        self.cache = cache if cache is not None else SemanticCache()
         logger.info("NutritionAnalyzer initialized with Gemini model")
 
     def analyze_recipe(self, recipe_description: str) -> Optional[Dict[str, Any]]:
         """
         Analyze recipe description and return structured nutrition information.
+        Results for the same or a closely matching description are served from cache.
         """
-        logger.info(f"Starting nutrition analysis for recipe: {recipe_description[:100]}...")
-        
-        prompt = f"""
-        Analyze this recipe and provide nutritional information in a structured format.
-        Recipe: {recipe_description}
-
-        Return ONLY a JSON object in this exact format:
-        {{
-            "nutrition": {{
-                "calories": number,
-                "protein": number,
-                "carbs": number,
-                "fat": number
-            }},
-            "confidence": {{
-                "calories": number between 0-1,
-                "protein": number between 0-1,
-                "carbs": number between 0-1,
-                "fat": number between 0-1
-            }},
-            "serving_size": {{
-                "amount": number,
-                "unit": "g" or "ml" or "oz" or "cup"
-            }},
-            "notes": [
-                "List of assumptions made",
-                "Key ingredients considered",
-                "Any limitations in the analysis"
-            ]
-        }}
+        logger.info("Starting nutrition analysis for recipe: %s...", recipe_description[:100])
+        return self.cache.get_or_compute(
+            recipe_description,
+            lambda: self._analyze(recipe_description),
+        )
 
-        Rules:
-        1. All numbers must be integers or floats
-        2. Confidence scores must be between 0 and 1
-        3. Only include the JSON object, no other text
-        4. If you can't determine a value, use null
-        5. Base estimates on standard portion sizes
-        6. Consider cooking methods and their impact on nutrition
-        """
+    def _analyze(self, recipe_description: str) -> Optional[Dict[str, Any]]:
+        """Run the Gemini nutrition analysis for a recipe description"""
+        prompt = f"Recipe: {recipe_description}\n"
 
         try:
             logger.info("Sending prompt to Gemini for nutrition analysis")
             # Get response from Gemini
-            response = self.model.generate_content(prompt)
-            logger.info(f"Received response from Gemini: {response.text[:200]}...")
-            
-            # Clean the response text by removing markdown formatting and extra data
-            cleaned_text = response.text
-            if cleaned_text.startswith('```json'):
-                cleaned_text = cleaned_text[7:]
-            if cleaned_text.endswith('```'):
-                cleaned_text = cleaned_text[:-3]
-            cleaned_text = cleaned_text.strip()
+            # Stream the response and stop reading once the JSON object is complete
+            response = self.model.generate_content(prompt, stream=True)
+            response_text = collect_streamed_json(chunk.text for chunk in response if chunk.parts)
+            logger.info("Received response from Gemini: %s...", response_text[:200])
             
-            # Extract just the JSON object using regex
-            json_match = re.search(r'\{[\s\S]*\}', cleaned_text)
-            if json_match:
-                cleaned_text = json_match.group()
-            
-            logger.info(f"Cleaned response text: {cleaned_text[:200]}...")
+            # Locate the JSON object in a single scan; this skips any markdown
+            # fences or other text around it without separate strip passes
+            json_text = extract_json_object(response_text)
+            if json_text is None:
+                logger.error("Could not find JSON in Gemini response")
+                logger.error("Raw response: %s", response_text)
+                return None
             
             # Parse the response as JSON
             try:
-                nutrition_data = json.loads(cleaned_text)
+                nutrition_data = orjson.loads(json_text)
                 logger.info("Successfully parsed Gemini response as JSON")
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse Gemini response as JSON: {str(e)}")
-                logger.error(f"Raw response: {response.text}")
+            except orjson.JSONDecodeError as e:
+                logger.error("Failed to parse Gemini response as JSON: %s", e)
+                logger.error("Raw response: %s", response_text)
                 return None
             
-            # Validate the structure
-            required_fields = ['nutrition', 'confidence', 'serving_size', 'notes']
-            for field in required_fields:
-                if field not in nutrition_data:
-                    logger.error(f"Missing required field in nutrition data: {field}")
-                    logger.error(f"Available fields: {list(nutrition_data.keys())}")
-                    return None
+            # Validate the structure, types and confidence ranges in one compiled check
+            if isinstance(nutrition_data, dict):
+                _coerce_numeric_strings(nutrition_data)
+            try:
+                validate_nutrition_data(nutrition_data)
+            except fastjsonschema.JsonSchemaException as e:
+                logger.error("Invalid nutrition data: %s", e.message)
+                logger.error("Nutrition data: %s", nutrition_data)
+                return None
 
-            # Validate nutrition values
             nutrition = nutrition_data['nutrition']
-            logger.info("Validating nutrition values")
-            for nutrient in ['calories', 'protein', 'carbs', 'fat']:
-                if nutrition.get(nutrient) is not None:
-                    try:
-                        nutrition[nutrient] = float(nutrition[nutrient])
-                        logger.info(f"Validated {nutrient}: {nutrition[nutrient]}")
-                    except (ValueError, TypeError) as e:
-                        logger.error(f"Invalid nutrition value for {nutrient}: {nutrition.get(nutrient)}")
-                        logger.error(f"Error: {str(e)}")
-                        return None
-
-            # Validate confidence scores
             confidence = nutrition_data['confidence']
-            logger.info("Validating confidence scores")
-            for nutrient in ['calories', 'protein', 'carbs', 'fat']:
-                if confidence.get(nutrient) is not None:
-                    try:
-                        conf_value = float(confidence[nutrient])
-                        if not 0 <= conf_value <= 1:
-                            logger.error(f"Confidence score for {nutrient} out of range: {conf_value}")
-                            return None
-                        confidence[nutrient] = conf_value
-                        logger.info(f"Validated confidence for {nutrient}: {conf_value}")
-                    except (ValueError, TypeError) as e:
-                        logger.error(f"Invalid confidence score for {nutrient}: {confidence.get(nutrient)}")
-                        logger.error(f"Error: {str(e)}")
-                        return None
+            for key in NUTRIENT_KEYS:
+                if nutrition.get(key) is not None:
+                    nutrition[key] = float(nutrition[key])
+                if confidence.get(key) is not None:
+                    confidence[key] = float(confidence[key])
+            logger.debug("Validated nutrition %s with confidence %s", nutrition, confidence)
 
             logger.info("Nutrition analysis completed successfully")
-            logger.info(f"Final nutrition data: {json.dumps(nutrition_data, indent=2)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Final nutrition data: %s", json.dumps(nutrition_data, indent=2))
             return nutrition_data
 
         except Exception as e:
-            logger.error(f"Error in nutrition analysis: {str(e)}")
-            logger.error(f"Full error details: {traceback.format_exc()}")
+            logger.exception("Error in nutrition analysis: %s", e)
             return None 
\ No newline at end of file
@@ -1,17 +1,260 @@
 import os
+import re
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import copy
+import hashlib
+import msgspec
+import orjson
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
 import google.generativeai as genai
-from typing import List, Dict, Any
-from bs4 import BeautifulSoup
-import feedparser
+import httplib2
+from google.api_core.exceptions import GoogleAPIError
+from cachetools import TTLCache
+from typing import List, Dict, Any, Callable, NamedTuple, Optional, Tuple
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on how long get_all_recipes waits for the slowest source
+SOURCE_TIMEOUT = 20
+
+# Per-call limits so a hung upstream fails fast instead of holding a worker:
+# (connect, read) seconds for HTTP calls, and seconds per Gemini/YouTube call
+HTTP_TIMEOUT = (3.05, 4)
+GEMINI_TIMEOUT = 10
+YOUTUBE_TIMEOUT = 5
+
+# Retries must fit inside SOURCE_TIMEOUT, or an abandoned fetch keeps holding a
+# source worker. HTTP_CALL_BUDGET is the worst case for one HTTP call: every
+# attempt hits both timeouts, plus the backoff before the retry
+HTTP_RETRIES = 1
+HTTP_BACKOFF = 0.2
+HTTP_CALL_BUDGET = (HTTP_RETRIES + 1) * sum(HTTP_TIMEOUT) + HTTP_BACKOFF * HTTP_RETRIES
+
+# A source that fails this many times in a row is skipped for BREAKER_COOLDOWN seconds
+BREAKER_THRESHOLD = 3
+BREAKER_COOLDOWN = 120
+
+# Failures a source reports as a SourceError. ValueError covers
+# unparseable JSON and Gemini replies with no text (e.g. blocked by safety filters)
+GEMINI_ERRORS = (GoogleAPIError, requests.RequestException, ValueError, msgspec.DecodeError)
+YOUTUBE_ERRORS = (HttpError, httplib2.HttpLib2Error, OSError)
+
+# How long fetched recipes and nutrition analyses are reused
+CACHE_TTL = 3600
+
+CONTEXT_FIELDS = ('diet_type', 'cuisine', 'dish_attributes')
+
+class QueryTerms(NamedTuple):
+    """The context fields a source searches on, or None where the user has no preference"""
+    diet_type: Optional[str]
+    cuisine: Optional[str]
+    dish_attributes: Optional[str]
+
+def _query_term(value: Any) -> Optional[str]:
+    """Hashable search term for one context field; lists such as dish_attributes are space-joined"""
+    if isinstance(value, (list, tuple)):
+        value = ' '.join(str(item) for item in value if item)
+    if isinstance(value, str) and value and value != 'any':
+        return value
+    return None
+
+def _query_terms(context: Dict[str, Any]) -> QueryTerms:
+    """Pull the searchable fields out of a request context once, for every source"""
+    return QueryTerms(*(_query_term(context.get(field)) for field in CONTEXT_FIELDS))
+
+@lru_cache(maxsize=256)
+def _build_query(terms: QueryTerms) -> str:
+    """Free-text search query for the given terms"""
+    parts = [term for term in (terms.cuisine, terms.diet_type, terms.dish_attributes) if term]
+    parts.append('recipe')
+    return ' '.join(parts)
+
+NUTRIENT_KEYS = ('calories', 'protein', 'carbs', 'fat')
+
+# Gemini JSON mode schema for blog recipe suggestions, so replies are a bare array
+BLOG_RESPONSE_SCHEMA = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'properties': {
+            'title': {'type': 'string'},
+            'url': {'type': 'string'},
+            'description': {'type': 'string'},
+        },
+        'required': ['title', 'url', 'description'],
+    },
+}
+
+# Gemini JSON mode schema for nutrition analyses, so replies always parse
+NUTRITION_RESPONSE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'nutrition': {
+            'type': 'object',
+            'properties': {key: {'type': 'number', 'nullable': True} for key in NUTRIENT_KEYS},
+            'required': list(NUTRIENT_KEYS),
+        },
+        'confidence': {
+            'type': 'object',
+            'properties': {key: {'type': 'number'} for key in NUTRIENT_KEYS},
+            'required': list(NUTRIENT_KEYS),
+        },
+        'serving_size': {
+            'type': 'object',
+            'properties': {
+                'amount': {'type': 'number', 'nullable': True},
+                'unit': {'type': 'string', 'nullable': True},
+            },
+            'required': ['amount', 'unit'],
+        },
+        'notes': {'type': 'array', 'items': {'type': 'string'}},
+    },
+    'required': ['nutrition', 'confidence', 'serving_size', 'notes'],
+}
+
+# Recipe descriptions (YouTube especially) trail off into links, hashtags and
+# sponsor blurbs; the ingredients and method almost always fit in the first part
+MAX_RECIPE_TEXT = 1500
+_RECIPE_NOISE_RE = re.compile(r'https?://\S+|#\S+|\n{3,}')
+
+def _clean_recipe_text(recipe_text: str) -> str:
+    """Drop URLs and hashtags, collapse blank-line runs and cap the length sent to Gemini"""
+    cleaned = _RECIPE_NOISE_RE.sub(lambda match: '\n\n' if match.group()[0] == '\n' else '', recipe_text)
+    return cleaned.strip()[:MAX_RECIPE_TEXT]
+
+# Only the recipe varies per call; the JSON shape comes from NUTRITION_RESPONSE_SCHEMA
+_NUTRITION_PROMPT_TEMPLATE = """
+Analyze the nutritional content of this recipe:
+{recipe_text}
+
+Rules:
+1. If you can't determine a value, use null
+2. Confidence scores should reflect your certainty (0 = completely uncertain, 1 = completely certain)
+3. Include notes about any assumptions or limitations
+4. Be conservative in your estimates
+"""
+
+class Nutrient(msgspec.Struct):
+    name: str
+    amount: Optional[float] = None
+
+
+class NutritionView(msgspec.Struct):
+    nutrients: List[Nutrient] = []
+
+
+class RecipeView(msgspec.Struct):
+    """The few Spoonacular recipe fields we use; everything else is skipped while decoding"""
+    id: int
+    title: str = ''
+    sourceUrl: Optional[str] = None
+    image: Optional[str] = None
+    nutrition: NutritionView = msgspec.field(default_factory=NutritionView)
+
+
+class SearchView(msgspec.Struct):
+    results: List[RecipeView] = []
+
+
+def _is_complete(recipe: RecipeView) -> bool:
+    """Whether a search result carries everything the recipes list shows"""
+    return bool(recipe.sourceUrl and recipe.image and recipe.nutrition.nutrients)
+
+
+def _merge_details(recipe: RecipeView, details: RecipeView) -> RecipeView:
+    """Fill the fields a search result is missing from its informationBulk details"""
+    return msgspec.structs.replace(
+        recipe,
+        sourceUrl=recipe.sourceUrl or details.sourceUrl,
+        image=recipe.image or details.image,
+        nutrition=recipe.nutrition if recipe.nutrition.nutrients else details.nutrition,
+    )
+
+
+_search_decoder = msgspec.json.Decoder(SearchView)
+_details_decoder = msgspec.json.Decoder(List[RecipeView])
+
+
+class NutritionBlock(msgspec.Struct):
+    """Per-nutrient values; reused for both the amounts and their confidence scores"""
+    calories: Optional[float] = None
+    protein: Optional[float] = None
+    carbs: Optional[float] = None
+    fat: Optional[float] = None
+
+
+class ServingSize(msgspec.Struct):
+    amount: Optional[float] = None
+    unit: Optional[str] = None
+
+
+class NutritionReport(msgspec.Struct):
+    """A Gemini nutrition analysis; numbers are coerced to float while decoding"""
+    nutrition: NutritionBlock = msgspec.field(default_factory=NutritionBlock)
+    confidence: NutritionBlock = msgspec.field(default_factory=NutritionBlock)
+    serving_size: ServingSize = msgspec.field(default_factory=ServingSize)
+    notes: List[str] = []
+
+
+# Non-strict so numeric strings like "12" still coerce, as float() did before
+_nutrition_decoder = msgspec.json.Decoder(NutritionReport, strict=False)
+
+class SourceError(Exception):
+    """A recipe source could not be reached or returned an unusable response"""
+
+
+class CircuitBreaker:
+    """Skips a source for `cooldown` seconds once it has failed `threshold` times in a row"""
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures: Dict[str, int] = {}
+        self._open_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, name: str) -> bool:
+        """Whether the source should be tried; after the cooldown it gets one more chance"""
+        with self._lock:
+            return time.monotonic() >= self._open_until.get(name, 0)
+
+    def record_success(self, name: str) -> None:
+        with self._lock:
+            self._failures.pop(name, None)
+            self._open_until.pop(name, None)
+
+    def record_failure(self, name: str) -> None:
+        with self._lock:
+            failures = self._failures.get(name, 0) + 1
+            self._failures[name] = failures
+            if failures >= self.threshold:
+                self._open_until[name] = time.monotonic() + self.cooldown
+                logger.warning("Skipping %s for %ss after %s consecutive failures", name, self.cooldown, failures)
+
+
+def create_session() -> requests.Session:
+    """HTTP session with pooled keep-alive connections and retries on transient errors"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(total=HTTP_RETRIES, backoff_factor=HTTP_BACKOFF, status_forcelist=[429, 500, 502, 503, 504]),
+    )
+    session.mount('https://', adapter)
+    return session
+
 class RecipeSource:
-    def __init__(self):
+    def __init__(self, session: Optional[requests.Session] = None):
+        self.session = session or create_session()
         self.spoonacular_api_key = os.getenv('SPOONACULAR_API_KEY')
         self.youtube_api_key = os.getenv('YOUTUBE_API_KEY')
         self.google_api_key = os.getenv('GOOGLE_API_KEY')
@@ -25,12 +268,28 @@ class RecipeSource:
             raise ValueError("GOOGLE_API_KEY is required")
 
         # Configure Gemini
-        genai.configure(api_key=self.google_api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        genai.configure(api_key=self.google_api_key, transport='rest')
+        self.model = genai.GenerativeModel(
+            'gemini-1.5-flash',
+            generation_config={
+                'response_mime_type': 'application/json',
+                'response_schema': BLOG_RESPONSE_SCHEMA,
+            },
+        )
+        self.nutrition_model = genai.GenerativeModel(
+            'gemini-1.5-flash',
+            generation_config={
+                'response_mime_type': 'application/json',
+                'response_schema': NUTRITION_RESPONSE_SCHEMA,
+            },
+        )
 
-        # Initialize YouTube API client
+        # Initialize YouTube API client once; every search reuses it
+        self.youtube = None
         if self.youtube_api_key:
-            self.youtube = build('youtube', 'v3', developerKey=self.youtube_api_key)
+            youtube_http = build_http()
+            youtube_http.timeout = YOUTUBE_TIMEOUT
+            self.youtube = build('youtube', 'v3', developerKey=self.youtube_api_key, http=youtube_http)
         
         # Headers to mimic a browser
         self.headers = {
@@ -39,115 +298,189 @@ class RecipeSource:
             'Accept-Language': 'en-US,en;q=0.5',
             'Connection': 'keep-alive',
         }
+        self.session.headers.update(self.headers)
+
+        # Sources are I/O bound, so fetch them concurrently
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='recipe-source')
+        # Separate pool for the requests a source fans out itself, so a source
+        # waiting on its own subtasks can never starve the source pool
+        self._subtask_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='recipe-subtask')
+
+        # Repeat queries and repeated recipe descriptions skip the network entirely
+        self._source_cache = TTLCache(maxsize=1024, ttl=CACHE_TTL)
+        self._nutrition_cache = TTLCache(maxsize=1024, ttl=CACHE_TTL)
+        self._cache_lock = threading.Lock()
+
+        self._breaker = CircuitBreaker()
+
+    def _fetchers(self) -> List[Tuple[str, Callable[[QueryTerms], List[Dict[str, Any]]]]]:
+        """Fetch callables for every configured source"""
+        fetchers = []
+        if self.spoonacular_api_key:
+            fetchers.append(('Spoonacular', self._get_spoonacular_recipes))
+        if self.youtube is not None:
+            fetchers.append(('YouTube', self._get_youtube_recipes))
+        fetchers.append(('blogs', self._get_blog_recipes))
+        return fetchers
 
     def get_all_recipes(self, context: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Get recipes from all available sources"""
-        logger.info(f"Getting recipes for context: {context}")
+        logger.info("Getting recipes for context: %s", context)
+
+        terms = _query_terms(context)
+        futures = []
+        for name, fetch in self._fetchers():
+            if not self._breaker.allow(name):
+                logger.info("Skipping %s while its circuit breaker is open", name)
+                continue
+            logger.info("Fetching recipes from %s", name)
+            futures.append((name, self._executor.submit(self._cached_fetch, name, fetch, terms)))
+
+        # Collect in source order; a slow source only costs the remaining time budget
+        deadline = time.monotonic() + SOURCE_TIMEOUT
         recipes = []
-        
-        # Get recipes from Spoonacular
-        if self.spoonacular_api_key:
-            logger.info("Fetching recipes from Spoonacular")
-            spoonacular_recipes = self._get_spoonacular_recipes(context)
-            recipes.extend(spoonacular_recipes)
-        
-        # Get recipes from YouTube
-        if self.youtube_api_key:
-            logger.info("Fetching recipes from YouTube")
-            youtube_recipes = self._get_youtube_recipes(context)
-            recipes.extend(youtube_recipes)
-        
-        # Get recipes from blogs
-        logger.info("Fetching recipes from blogs")
-        blog_recipes = self._get_blog_recipes(context)
-        recipes.extend(blog_recipes)
-        
-        logger.info(f"Total recipes found: {len(recipes)}")
+        for name, future in futures:
+            try:
+                recipes.extend(future.result(timeout=max(0, deadline - time.monotonic())))
+            except FutureTimeoutError:
+                logger.warning("Timed out fetching recipes from %s", name)
+                self._breaker.record_failure(name)
+            except SourceError as e:
+                logger.error("%s", e)
+                self._breaker.record_failure(name)
+            except Exception:
+                # Sources raise SourceError for expected failures, so this is a bug; keep the other sources' results
+                logger.exception("Unexpected error fetching recipes from %s", name)
+                self._breaker.record_failure(name)
+            else:
+                self._breaker.record_success(name)
+
+        logger.info("Total recipes found: %s", len(recipes))
+        return recipes
+
+    def _cached_fetch(
+        self,
+        name: str,
+        fetch: Callable[[QueryTerms], List[Dict[str, Any]]],
+        terms: QueryTerms
+    ) -> List[Dict[str, Any]]:
+        """Fetch recipes from a source, reusing recent results for the same query terms"""
+        key = (name, terms)
+        with self._cache_lock:
+            cached = self._source_cache.get(key)
+        if cached is not None:
+            logger.info("Using cached recipes from %s", name)
+            return copy.deepcopy(cached)
+
+        recipes = fetch(terms)
+        # Failed sources raise instead of returning, but a recipe whose nutrition
+        # analysis failed only carries the fallback; don't pin that for the whole TTL
+        if any(recipe.get('nutrition_failed') for recipe in recipes):
+            logger.info("Not caching recipes from %s with failed nutrition analyses", name)
+        else:
+            with self._cache_lock:
+                self._source_cache[key] = copy.deepcopy(recipes)
         return recipes
 
-    def _get_spoonacular_recipes(self, context: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _get_spoonacular_recipes(self, terms: QueryTerms) -> List[Dict[str, Any]]:
         """Get recipes from Spoonacular API"""
+        started = time.monotonic()
+        # Build query parameters
+        params = {
+            'apiKey': self.spoonacular_api_key,
+            'number': 3,  # Limit to 3 recipes
+            'addRecipeNutrition': True,
+            'fillIngredients': True,
+            'instructionsRequired': True
+        }
+        
+        # Add context-based parameters
+        if terms.diet_type:
+            params['diet'] = terms.diet_type
+        if terms.cuisine:
+            params['cuisine'] = terms.cuisine
+        if terms.dish_attributes:
+            params['query'] = terms.dish_attributes
+        
         try:
-            # Build query parameters
-            params = {
-                'apiKey': self.spoonacular_api_key,
-                'number': 3,  # Limit to 3 recipes
-                'addRecipeNutrition': True,
-                'fillIngredients': True,
-                'instructionsRequired': True
-            }
-            
-            # Add context-based parameters
-            if context.get('diet_type') and context['diet_type'] != 'any':
-                params['diet'] = context['diet_type']
-            if context.get('cuisine') and context['cuisine'] != 'any':
-                params['cuisine'] = context['cuisine']
-            if context.get('dish_attributes') and context['dish_attributes'] != 'any':
-                params['query'] = context['dish_attributes']
-            
             # Make API request
-            response = requests.get(
+            response = self.session.get(
                 'https://api.spoonacular.com/recipes/complexSearch',
-                params=params
+                params=params,
+                timeout=HTTP_TIMEOUT
             )
-            response.raise_for_status()
-            
-            data = response.json()
-            recipes = []
+            if not response.ok:
+                response.raise_for_status()
             
-            for recipe in data.get('results', []):
-                # Get detailed recipe information
-                recipe_id = recipe['id']
-                details_response = requests.get(
-                    f'https://api.spoonacular.com/recipes/{recipe_id}/information',
-                    params={'apiKey': self.spoonacular_api_key}
-                )
-                details_response.raise_for_status()
-                details = details_response.json()
-                
-                # Extract nutrition information
-                nutrition = details.get('nutrition', {})
-                nutrients = nutrition.get('nutrients', [])
-                nutrition_info = {
-                    'calories': next((n['amount'] for n in nutrients if n['name'] == 'Calories'), None),
-                    'protein': next((n['amount'] for n in nutrients if n['name'] == 'Protein'), None),
-                    'carbs': next((n['amount'] for n in nutrients if n['name'] == 'Carbohydrates'), None),
-                    'fat': next((n['amount'] for n in nutrients if n['name'] == 'Fat'), None)
-                }
-                
-                recipes.append({
-                    'title': recipe['title'],
-                    'sourceUrl': recipe['sourceUrl'],
-                    'imageUrl': recipe['image'],
-                    'nutrition': nutrition_info,
-                    'source': 'Spoonacular'
-                })
+            # Decode only the fields we use straight from the body bytes; an empty body means no results
+            results = _search_decoder.decode(response.content or b'{}').results
             
-            return recipes
+            # addRecipeNutrition already puts nutrients, sourceUrl and image in the
+            # search results; only fetch details for the few results that lack them
+            incomplete = [recipe.id for recipe in results if not _is_complete(recipe)]
+            if incomplete and time.monotonic() - started + HTTP_CALL_BUDGET > SOURCE_TIMEOUT:
+                # Too little time left for a second call; show what the search returned
+                logger.warning("Skipping Spoonacular details for %s recipes, search was slow", len(incomplete))
+                incomplete = []
+            details_by_id = self._get_spoonacular_details(incomplete)
+        except (requests.RequestException, msgspec.DecodeError) as e:
+            raise SourceError(f"Error fetching recipes from Spoonacular: {e}") from e
+
+        recipes = []
+        for recipe in results:
+            details = details_by_id.get(recipe.id)
+            if details is not None:
+                recipe = _merge_details(recipe, details)
+            # Extract nutrition information
+            # First match wins, as the linear scan did; Spoonacular can repeat a nutrient name
+            by_name = {}
+            for n in recipe.nutrition.nutrients:
+                by_name.setdefault(n.name, n.amount)
+            nutrition_info = {
+                'calories': by_name.get('Calories'),
+                'protein': by_name.get('Protein'),
+                'carbs': by_name.get('Carbohydrates'),
+                'fat': by_name.get('Fat')
+            }
             
-        except Exception as e:
-            logger.error(f"Error fetching recipes from Spoonacular: {str(e)}")
-            return []
+            recipes.append({
+                'title': recipe.title,
+                'sourceUrl': recipe.sourceUrl,
+                'imageUrl': recipe.image,
+                'nutrition': nutrition_info,
+                'source': 'Spoonacular'
+            })
+        
+        return recipes
+
+    def _get_spoonacular_details(self, recipe_ids: List[int]) -> Dict[int, RecipeView]:
+        """Get detailed information for Spoonacular recipes, keyed by recipe id"""
+        # A single informationBulk request covers every id, so there is no
+        # per-recipe fan-out for HTTP/2 multiplexing to speed up
+        if not recipe_ids:
+            return {}
+        details_response = self.session.get(
+            'https://api.spoonacular.com/recipes/informationBulk',
+            params={
+                'apiKey': self.spoonacular_api_key,
+                'ids': ','.join(str(recipe_id) for recipe_id in recipe_ids),
+                'includeNutrition': True
+            },
+            timeout=HTTP_TIMEOUT
+        )
+        if not details_response.ok:
+            details_response.raise_for_status()
+        return {details.id: details for details in _details_decoder.decode(details_response.content or b'[]')}
 
-    def _get_youtube_recipes(self, context: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _get_youtube_recipes(self, terms: QueryTerms) -> List[Dict[str, Any]]:
         """Get recipes from YouTube"""
+        if self.youtube is None:
+            raise SourceError("YouTube client is not configured")
+        search_query = _build_query(terms)
+
         try:
-            youtube = build('youtube', 'v3', developerKey=self.youtube_api_key)
-            
-            # Build search query
-            query_parts = []
-            if context.get('cuisine') and context['cuisine'] != 'any':
-                query_parts.append(context['cuisine'])
-            if context.get('diet_type') and context['diet_type'] != 'any':
-                query_parts.append(context['diet_type'])
-            if context.get('dish_attributes') and context['dish_attributes'] != 'any':
-                query_parts.append(context['dish_attributes'])
-            query_parts.append('recipe')
-            
-            search_query = ' '.join(query_parts)
-            
             # Search for videos
-            request = youtube.search().list(
+            request = self.youtube.search().list(
                 part='snippet',
                 q=search_query,
                 type='video',
@@ -156,19 +489,30 @@ class RecipeSource:
             )
             response = request.execute()
             
-            recipes = []
-            for item in response.get('items', []):
-                video_id = item['id']['videoId']
-                video_details = youtube.videos().list(
-                    part='snippet,contentDetails',
-                    id=video_id
-                ).execute()
-                
-                video_info = video_details['items'][0]['snippet']
-                
-                # Get nutrition information using Gemini
-                nutrition_info = self._analyze_recipe_nutrition(video_info['description'])
-                
+            video_ids = [item['id']['videoId'] for item in response.get('items', []) if 'videoId' in item.get('id', {})]
+            if not video_ids:
+                return []
+
+            # Fetch details for every video in one round-trip
+            video_details = self.youtube.videos().list(
+                part='snippet,contentDetails',
+                id=','.join(video_ids)
+            ).execute()
+        except YOUTUBE_ERRORS as e:
+            raise SourceError(f"Error fetching recipes from YouTube: {e}") from e
+
+        snippets = {item.get('id'): item.get('snippet') for item in video_details.get('items', [])}
+        videos = [(video_id, snippets[video_id]) for video_id in video_ids if snippets.get(video_id)]
+
+        # Get nutrition information using Gemini, analyzing every video concurrently
+        analyses = self._subtask_executor.map(
+            self._analyze_recipe_nutrition,
+            [video_info.get('description', '') for _, video_info in videos]
+        )
+
+        recipes = []
+        for (video_id, video_info), nutrition_info in zip(videos, analyses):
+            try:
                 recipes.append({
                     'title': video_info['title'],
                     'sourceUrl': f'https://www.youtube.com/watch?v={video_id}',
@@ -177,154 +521,95 @@ class RecipeSource:
                     'nutrition_confidence': nutrition_info.get('confidence'),
                     'serving_size': nutrition_info.get('serving_size'),
                     'nutrition_notes': nutrition_info.get('notes'),
+                    'nutrition_failed': nutrition_info.get('failed', False),
                     'source': 'YouTube'
                 })
-            
-            return recipes
-            
-        except Exception as e:
-            logger.error(f"Error fetching recipes from YouTube: {str(e)}")
-            return []
+            except KeyError as e:
+                logger.warning("Skipping YouTube video %s missing field %s", video_id, e)
+        
+        return recipes
 
-    def _get_blog_recipes(self, context: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _get_blog_recipes(self, terms: QueryTerms) -> List[Dict[str, Any]]:
         """Get recipes from food blogs"""
+        search_query = _build_query(terms)
+        
+        # Use Gemini to search and analyze blog recipes
+        prompt = f"""
+        Find 3 recipes matching: {search_query}. For each recipe, provide the title, URL, and a brief description. Return the results in JSON format.
+        """
+        
         try:
-            # Build search query
-            query_parts = []
-            if context.get('cuisine') and context['cuisine'] != 'any':
-                query_parts.append(context['cuisine'])
-            if context.get('diet_type') and context['diet_type'] != 'any':
-                query_parts.append(context['diet_type'])
-            if context.get('dish_attributes') and context['dish_attributes'] != 'any':
-                query_parts.append(context['dish_attributes'])
-            query_parts.append('recipe')
-            
-            search_query = ' '.join(query_parts)
-            
-            # Use Gemini to search and analyze blog recipes
-            prompt = f"""
-            Find 3 recipes matching: {search_query}. For each recipe, provide the title, URL, and a brief description. Return the results in JSON format.
-            """
-            
-            response = self.model.generate_content(prompt)
-            response_text = response.text
-            
-            # Parse the response
+            response = self.model.generate_content(prompt, request_options={'timeout': GEMINI_TIMEOUT})
+            recipes_data = orjson.loads(response.text)
+        except GEMINI_ERRORS as e:
+            raise SourceError(f"Error fetching recipes from blogs: {e}") from e
+
+        if not isinstance(recipes_data, list):
+            raise SourceError("Failed to parse Gemini response for blog recipes")
+        recipes_data = [recipe for recipe in recipes_data if isinstance(recipe, dict)]
+
+        # Get nutrition information using Gemini, analyzing every recipe concurrently
+        analyses = self._subtask_executor.map(
+            self._analyze_recipe_nutrition,
+            [str(recipe.get('description') or '') for recipe in recipes_data]
+        )
+
+        recipes = []
+        for recipe, nutrition_info in zip(recipes_data, analyses):
             try:
-                recipes_data = json.loads(response_text)
-                recipes = []
-                
-                for recipe in recipes_data:
-                    # Get nutrition information using Gemini
-                    nutrition_info = self._analyze_recipe_nutrition(recipe.get('description', ''))
-                    
-                    recipes.append({
-                        'title': recipe['title'],
-                        'sourceUrl': recipe['url'],
-                        'nutrition': nutrition_info.get('nutrition'),
-                        'nutrition_confidence': nutrition_info.get('confidence'),
-                        'serving_size': nutrition_info.get('serving_size'),
-                        'nutrition_notes': nutrition_info.get('notes'),
-                        'source': 'Blog'
-                    })
-                
-                return recipes
-                
-            except json.JSONDecodeError:
-                logger.error("Failed to parse Gemini response for blog recipes")
-                return []
-            
-        except Exception as e:
-            logger.error(f"Error fetching recipes from blogs: {str(e)}")
-            return []
+                recipes.append({
+                    'title': recipe['title'],
+                    'sourceUrl': recipe['url'],
+                    'nutrition': nutrition_info.get('nutrition'),
+                    'nutrition_confidence': nutrition_info.get('confidence'),
+                    'serving_size': nutrition_info.get('serving_size'),
+                    'nutrition_notes': nutrition_info.get('notes'),
+                    'nutrition_failed': nutrition_info.get('failed', False),
+                    'source': 'Blog'
+                })
+            except KeyError as e:
+                logger.warning("Skipping blog recipe missing field %s", e)
+        
+        return recipes
 
     def _analyze_recipe_nutrition(self, recipe_text: str) -> Dict[str, Any]:
         """Analyze recipe nutrition using Gemini"""
+        recipe_text = _clean_recipe_text(recipe_text)
+        cache_key = hashlib.sha1(recipe_text.encode()).hexdigest()
+        with self._cache_lock:
+            cached = self._nutrition_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Using cached nutrition analysis")
+            return copy.deepcopy(cached)
+
         try:
-            logger.info(f"Starting nutrition analysis for recipe: {recipe_text[:100]}...")
+            logger.info("Starting nutrition analysis for recipe: %s...", recipe_text[:100])
             
-            prompt = f"""
-            Analyze the nutritional content of this recipe:
-            {recipe_text}
-
-            Return the analysis in this JSON format:
-            {{
-                "nutrition": {{
-                    "calories": number or null,
-                    "protein": number or null,
-                    "carbs": number or null,
-                    "fat": number or null
-                }},
-                "confidence": {{
-                    "calories": number between 0 and 1,
-                    "protein": number between 0 and 1,
-                    "carbs": number between 0 and 1,
-                    "fat": number between 0 and 1
-                }},
-                "serving_size": {{
-                    "amount": number or null,
-                    "unit": string or null
-                }},
-                "notes": [
-                    "note about the analysis",
-                    "note about assumptions",
-                    "note about limitations"
-                ]
-            }}
-
-            Rules:
-            1. If you can't determine a value, use null
-            2. Confidence scores should reflect your certainty (0 = completely uncertain, 1 = completely certain)
-            3. Include notes about any assumptions or limitations
-            4. Be conservative in your estimates
-            """
+            prompt = _NUTRITION_PROMPT_TEMPLATE.format(recipe_text=recipe_text)
 
             logger.info("Sending prompt to Gemini for nutrition analysis")
-            response = self.model.generate_content(prompt)
+            response = self.nutrition_model.generate_content(prompt, request_options={'timeout': GEMINI_TIMEOUT})
             response_text = response.text
-            logger.info(f"Received response from Gemini: {response_text}")
-            
-            # Clean the response text
-            cleaned_text = response_text.replace('```json', '').replace('```', '').strip()
-            logger.info(f"Cleaned response text: {cleaned_text}")
-            
-            # Parse the JSON response
-            try:
-                nutrition_data = json.loads(cleaned_text)
-                logger.info("Successfully parsed Gemini response as JSON")
-                
-                # Validate nutrition values
-                logger.info("Validating nutrition values")
-                for key, value in nutrition_data.get('nutrition', {}).items():
-                    if value is not None:
-                        nutrition_data['nutrition'][key] = float(value)
-                        logger.info(f"Validated {key}: {value}")
-                
-                # Validate confidence scores
-                logger.info("Validating confidence scores")
-                for key, value in nutrition_data.get('confidence', {}).items():
-                    if value is not None:
-                        nutrition_data['confidence'][key] = float(value)
-                        logger.info(f"Validated confidence for {key}: {value}")
-                
-                logger.info("Nutrition analysis completed successfully")
-                logger.info(f"Final nutrition data: {json.dumps(nutrition_data, indent=2)}")
-                return nutrition_data
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse nutrition data: {str(e)}")
-                return {
-                    'nutrition': {'calories': None, 'protein': None, 'carbs': None, 'fat': None},
-                    'confidence': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0},
-                    'serving_size': {'amount': None, 'unit': None},
-                    'notes': ['Failed to analyze nutrition information']
-                }
-                
-        except Exception as e:
-            logger.error(f"Error in nutrition analysis: {str(e)}")
+            logger.debug("Received response from Gemini: %s", response_text)
+
+            # JSON mode guarantees the reply is a single JSON object; decoding
+            # validates the shape and coerces every number to float in one pass
+            nutrition_data = msgspec.to_builtins(_nutrition_decoder.decode(response_text))
+
+            logger.info("Nutrition analysis completed successfully")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Final nutrition data: %s", orjson.dumps(nutrition_data).decode())
+            with self._cache_lock:
+                self._nutrition_cache[cache_key] = copy.deepcopy(nutrition_data)
+            return nutrition_data
+
+        except GEMINI_ERRORS as e:
+            logger.error("Error in nutrition analysis: %s", e)
             return {
                 'nutrition': {'calories': None, 'protein': None, 'carbs': None, 'fat': None},
                 'confidence': {'calories': 0, 'protein': 0, 'carbs': 0, 'fat': 0},
                 'serving_size': {'amount': None, 'unit': None},
-                'notes': ['Error occurred during nutrition analysis']
+                'notes': ['Error occurred during nutrition analysis'],
+                # Never cached, and marks the recipes built on it so they aren't cached either
+                'failed': True
             } 
\ No newline at end of file
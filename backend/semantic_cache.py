@@ -0,0 +1,174 @@
+import copy
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import google.generativeai as genai
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = 'models/text-embedding-004'
+
+# The embedding runs before the Gemini call on every miss, so keep it short
+EMBED_TIMEOUT = 3
+
+
+def embed_text(text: str) -> np.ndarray:
+    """Embed text with the Gemini embedding model"""
+    result = genai.embed_content(model=EMBEDDING_MODEL, content=text, request_options={'timeout': EMBED_TIMEOUT})
+    return np.asarray(result['embedding'], dtype=np.float32)
+
+
+class _Entry:
+    __slots__ = ('expires_at', 'scope_id', 'embedding', 'value')
+
+    def __init__(self, expires_at: float, scope_id: int, embedding: Optional[np.ndarray], value: Dict[str, Any]):
+        self.expires_at = expires_at
+        self.scope_id = scope_id
+        self.embedding = embedding
+        self.value = value
+
+
+class SemanticCache:
+    """
+    In-process cache for parsed Gemini responses.
+
+    Lookups first try an exact match on the whitespace-normalized text, then
+    fall back to the closest previously seen text (cosine similarity >=
+    threshold) within the same scope. Passing embed_fn=None keeps the cache
+    exact-match only. Entries expire after `ttl` seconds and the least
+    recently used entry is evicted once `maxsize` is reached.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Optional[Callable[[str], np.ndarray]] = embed_text,
+        threshold: float = 0.92,
+        ttl: float = 3600,
+        maxsize: int = 512,
+    ):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[bytes, _Entry]' = OrderedDict()
+        # (expires_at, key) in insertion order; with a fixed ttl this is also
+        # expiry order, so expired entries are always at the front
+        self._expiry: 'deque[Tuple[float, bytes]]' = deque()
+        self._lock = threading.Lock()
+        # Normalized embeddings stacked row-wise so a lookup is one GEMV
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[bytes] = []
+        self._matrix_scopes: Optional[np.ndarray] = None
+        self._dirty = True
+
+    @staticmethod
+    def _scope_id(scope: Any) -> int:
+        digest = hashlib.blake2b(repr(scope).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
+
+    @staticmethod
+    def _key(text: str, scope_id: int) -> bytes:
+        digest = hashlib.blake2b(' '.join(text.split()).encode(), digest_size=16)
+        digest.update(scope_id.to_bytes(8, 'little'))
+        return digest.digest()
+
+    def get_or_compute(
+        self,
+        text: str,
+        compute: Callable[[], Optional[Dict[str, Any]]],
+        scope: Any = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached value for text (or a semantically similar text in
+        the same scope), calling compute() and caching its result on a miss.
+        None results are not cached.
+        """
+        scope_id = self._scope_id(scope)
+        key = self._key(text, scope_id)
+
+        with self._lock:
+            self._evict_expired()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                logger.info("Semantic cache exact hit")
+                return copy.deepcopy(entry.value)
+
+        embedding = self._embed(text)
+        if embedding is not None:
+            with self._lock:
+                value = self._nearest(embedding, scope_id)
+            if value is not None:
+                logger.info("Semantic cache similarity hit")
+                return value
+
+        value = compute()
+        if value is not None:
+            self._store(key, scope_id, embedding, value)
+        return value
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        if self.embed_fn is None:
+            return None
+        try:
+            vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        except Exception as e:
+            logger.warning("Failed to embed text for semantic cache: %s", e)
+            return None
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+        return vector / norm
+
+    def _nearest(self, embedding: np.ndarray, scope_id: int) -> Optional[Dict[str, Any]]:
+        if self._dirty:
+            self._rebuild_matrix()
+        if self._matrix is None:
+            return None
+
+        similarities = self._matrix @ embedding
+        similarities[self._matrix_scopes != np.uint64(scope_id)] = -1.0
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+
+        key = self._matrix_keys[best]
+        self._entries.move_to_end(key)
+        return copy.deepcopy(self._entries[key].value)
+
+    def _store(self, key: bytes, scope_id: int, embedding: Optional[np.ndarray], value: Dict[str, Any]) -> None:
+        with self._lock:
+            expires_at = time.monotonic() + self.ttl
+            self._entries[key] = _Entry(expires_at, scope_id, embedding, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            self._expiry.append((expires_at, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, key = self._expiry.popleft()
+            entry = self._entries.get(key)
+            # Skip keys that were evicted by LRU or stored again since
+            if entry is not None and entry.expires_at == expires_at:
+                del self._entries[key]
+                self._dirty = True
+
+    def _rebuild_matrix(self) -> None:
+        rows = [(key, entry) for key, entry in self._entries.items() if entry.embedding is not None]
+        if rows:
+            self._matrix = np.vstack([entry.embedding for _, entry in rows])
+            self._matrix_keys = [key for key, _ in rows]
+            self._matrix_scopes = np.fromiter((entry.scope_id for _, entry in rows), dtype=np.uint64, count=len(rows))
+        else:
+            self._matrix = None
+            self._matrix_keys = []
+            self._matrix_scopes = None
+        self._dirty = False